@@ -133,6 +133,11 @@ st.subheader("2.1) Aplicar fechas globales (opcional)")
 colf1, colf2 = st.columns(2)
 fecha_inicio_global = colf1.date_input("Fecha de INICIO (global)")
 fecha_fin_global    = colf2.date_input("Fecha de FIN (global)", value=fecha_inicio_global)
+feriados_txt = st.text_area(
+    "Feriados a excluir (opcional)",
+    placeholder="2025-08-30\n2025-10-08",
+    help="Una fecha por línea. Se usan para contar las sesiones reales de cada grupo según DIAS."
+)
 
 aplicar = st.button("📌 Aplicar fechas globales a INICIO y FIN y preparar descarga")
 
@@ -142,6 +147,34 @@ def _combina_fecha(fecha, x_datetime):
         return None
     return datetime.combine(fecha, x_datetime.time())
 
+if archivo is not None and fecha_fin_global >= fecha_inicio_global:
+    from sesiones_av import contar_sesiones, expandir_sesiones, mascara_dias, parsear_feriados
+
+    feriados = parsear_feriados(feriados_txt)
+    sesiones = contar_sesiones(df, fecha_inicio_global, fecha_fin_global, feriados)
+    _, dias_invalidos = mascara_dias(df["DIAS"])
+
+    cs1, cs2, cs3 = st.columns(3)
+    cs1.metric("Sesiones en el rango", int(sesiones.sum()))
+    cs2.metric("Filas sin sesiones", int((sesiones == 0).sum()))
+    cs3.metric("Feriados excluidos", len(feriados))
+    if (dias_invalidos != "").any():
+        st.warning("Hay filas con códigos de DIAS no reconocidos: "
+                   + ", ".join(sorted(set(",".join(dias_invalidos[dias_invalidos != ""]).split(",")))))
+
+    with st.expander("Ver sesiones por fila / calendario expandido"):
+        st.dataframe(
+            df[["CORREO","CURSO","GRUPO","DIAS"]].assign(SESIONES=sesiones, DIAS_INVALIDOS=dias_invalidos).head(200),
+            use_container_width=True
+        )
+        calendario = expandir_sesiones(df, fecha_inicio_global, fecha_fin_global, feriados)
+        st.download_button(
+            "📅 Descargar calendario de sesiones (CSV)",
+            data=calendario.to_csv(index=False).encode("utf-8"),
+            file_name="sesiones_expandidas.csv",
+            mime="text/csv"
+        )
+
 if archivo is not None and aplicar:
     # Trabajar sobre el df original subido (df)
     df_adj = df.copy()
@@ -166,6 +199,8 @@ if archivo is not None and aplicar:
             return _duracion_min(row["INICIO"], row["FIN"])
 
     df_adj["DURACION"] = df_adj.apply(_dur_out, axis=1)
+    if fecha_fin_global >= fecha_inicio_global:
+        df_adj["SESIONES"] = contar_sesiones(df_adj, fecha_inicio_global, fecha_fin_global, feriados)
 
     st.success("Fechas aplicadas. Vista previa (primeras 20 filas):")
     st.dataframe(df_adj.head(20), use_container_width=True)
@@ -190,6 +225,43 @@ if archivo is not None and aplicar:
     # (Opcional) Dejarlo en memoria para ejecutar de frente sin volver a subir
     st.session_state["df_para_ejecucion"] = df_adj
 
+# ===== 2.2) Sincronización delta contra la última carga aceptada =====
+st.subheader("2.2) Cambios respecto a la última carga (delta)")
+
+solo_delta = False
+if archivo is not None:
+    from estado_av import calcular_delta, DELTA_NUEVO, DELTA_CAMBIADO, DELTA_SIN_CAMBIOS
+
+    df_base = st.session_state.get("df_para_ejecucion", df)
+    df_delta, df_elim = calcular_delta(df_base)
+    conteo = df_delta["_DELTA"].value_counts()
+
+    cd1, cd2, cd3, cd4 = st.columns(4)
+    cd1.metric("Nuevas",      int(conteo.get(DELTA_NUEVO, 0)))
+    cd2.metric("Cambiadas",   int(conteo.get(DELTA_CAMBIADO, 0)))
+    cd3.metric("Sin cambios", int(conteo.get(DELTA_SIN_CAMBIOS, 0)))
+    cd4.metric("Eliminadas",  len(df_elim))
+
+    st.caption(
+        "Cada sesión se identifica por correo, curso, grupo, hora de inicio y días. "
+        "Si una sesión cambia de hora o de días aparece como NUEVA (y la anterior como eliminada): "
+        "se creará una segunda reunión y la anterior seguirá en el Aula Virtual hasta borrarla a mano."
+    )
+    pendientes = df_delta[df_delta["_DELTA"].isin([DELTA_NUEVO, DELTA_CAMBIADO])]
+    if len(pendientes):
+        st.caption("Filas que se enviarán al navegador (primeras 50):")
+        st.dataframe(pendientes.head(50), use_container_width=True)
+    if len(df_elim):
+        with st.expander(f"Filas de la última carga que ya no vienen en el Excel ({len(df_elim)})"):
+            st.caption("Solo informativo: no se eliminan del Aula Virtual.")
+            st.dataframe(df_elim, use_container_width=True)
+
+    solo_delta = st.checkbox(
+        "Enviar solo filas NUEVAS y CAMBIADAS",
+        value=True,
+        help="El estado se guarda por PERIODO en 'estado/' tras cada ejecución en PRODUCCIÓN."
+    )
+
 # ========================
 # 3) Ejecutar (prueba/producción)
 # ========================
@@ -215,7 +287,13 @@ if archivo is not None:
     ejecutar = st.button("🚀 Ejecutar ahora")
     if ejecutar:
         from runner_av import run_batch
-        df_to_run = st.session_state.get("df_para_ejecucion", df)
+        # df_delta trae _CLAVE calculada sobre el Excel completo: el estado se registra con ella
+        df_to_run = df_delta
+        if solo_delta:
+            df_to_run = df_delta[df_delta["_DELTA"].isin([DELTA_NUEVO, DELTA_CAMBIADO])]
+            if df_to_run.empty:
+                st.info("No hay filas nuevas ni cambiadas: nada que enviar.")
+                st.stop()
         resumen = run_batch(
             df_to_run,
             modo=modo,          # ← pasamos el modo textual
@@ -223,10 +301,95 @@ if archivo is not None:
         )
 
         st.success(f"✅ Lote terminado • Total: {resumen['total']} • OK: {resumen['ok']} • Fallas: {resumen['fail']}")
+        if modo == "PRODUCCIÓN":
+            no_verif = resumen.get('no_encontrados', 0)
+            sin_leer = resumen['ok'] - resumen.get('verificados', 0) - no_verif
+            st.write(f"🔎 Verificadas en el listado: {resumen.get('verificados', 0)} de {resumen['ok']}")
+            if no_verif > 0:
+                st.warning(f"{no_verif} fila(s) GUARDADO no aparecen en el listado del aula (revisa el CSV, columna 'verificado').")
+            if sin_leer > 0:
+                st.info(f"{sin_leer} fila(s) quedaron sin verificar: no se pudo leer el listado de su aula.")
         st.write(f"📄 Log TXT: {resumen['log_txt']}")
         st.write(f"📊 Log CSV: {resumen['log_csv']}")
+        if resumen.get("log_control"):
+            st.write(f"⏱️ Ajustes de ritmo: {resumen['log_control']} "
+                     f"(final: timeout {resumen['timeout_final_ms']} ms • pausa {resumen['pausa_final_ms']} ms)")
         if resumen.get("screenshots_dir"):
             st.write(f"🖼️ Capturas: {resumen['screenshots_dir']}")
         st.caption("Los archivos se guardan en 'logs/' y las capturas en 'screenshots/'.")
+        st.session_state["fallas"] = resumen["fallas"]
+        # la re-ejecución usa el modo de ESTA corrida, no el que muestre luego el selector
+        st.session_state["fallas_modo"] = modo
 else:
     st.info("Sube primero tu Excel para habilitar la ejecución.")
+
+# ===== 3.1) Triage de fallas: re-ejecutar solo un cluster =====
+fallas = st.session_state.get("fallas")
+if fallas is not None and len(fallas):
+    from triage_av import DESCRIPCION_CLUSTER, CLUSTER_GUARDADO
+
+    modo_fallas = st.session_state.get("fallas_modo", modo)
+    st.subheader("3.1) Fallas agrupadas")
+    st.caption("Re-ejecuta solo las filas de un grupo, reutilizando la sesión abierta (sin nuevo login si es reciente). "
+               f"Modo: **{modo_fallas}** (el de la corrida que produjo las fallas).")
+    if st.session_state.get("rerun_msg"):
+        st.success(st.session_state.pop("rerun_msg"))
+    for cluster, grupo in fallas.groupby("_CLUSTER", sort=False):
+        ct1, ct2 = st.columns([3, 1], vertical_alignment="center")
+        ct1.markdown(f"**{cluster}** • {len(grupo)} fila(s) — {DESCRIPCION_CLUSTER.get(cluster, '')}")
+        if cluster == CLUSTER_GUARDADO:
+            ct1.caption("⚠️ Revisa el listado antes de re-ejecutar: algunas pudieron crearse y duplicarse.")
+        with ct1.expander("Ver filas"):
+            st.dataframe(grupo[["CORREO","TEMA","CURSO","GRUPO","_MENSAJE"]], use_container_width=True)
+        if ct2.button(f"🔁 Re-ejecutar {len(grupo)}", key=f"rerun_{cluster}"):
+            from runner_av import run_batch
+            resumen = run_batch(
+                grupo.drop(columns=["_CLUSTER", "_MENSAJE"]),
+                modo=modo_fallas,
+                headless=headless,
+                reusar_sesion=True
+            )
+            st.session_state["rerun_msg"] = (
+                f"Re-ejecución {cluster} • OK: {resumen['ok']} • Fallas: {resumen['fail']} • Log: {resumen['log_csv']}"
+            )
+            # las filas re-ejecutadas se reemplazan por lo que siga fallando
+            st.session_state["fallas"] = pd.concat(
+                [fallas[fallas["_CLUSTER"] != cluster], resumen["fallas"]]
+            )
+            st.rerun()
+
+# ========================
+# 4) Historial de ejecuciones (SQLite)
+# ========================
+st.divider()
+st.subheader("4) Historial de ejecuciones")
+
+from historial_av import ultimo_guardado, fallas_por_paso, throughput_por_run, importar_logs
+
+tab_buscar, tab_stats, tab_import = st.tabs(["🔍 ¿Se guardó?", "📈 Estadísticas", "📂 Importar logs antiguos"])
+
+with tab_buscar:
+    cb1, cb2, cb3, cb4 = st.columns(4)
+    h_correo  = cb1.text_input("Correo")
+    h_periodo = cb2.text_input("Periodo")
+    h_curso   = cb3.text_input("Curso")
+    h_grupo   = cb4.text_input("Grupo")
+    if st.button("Buscar último guardado"):
+        res = ultimo_guardado(h_correo, h_periodo, h_curso, h_grupo)
+        if res.empty:
+            st.info("No hay registros GUARDADO con esos filtros.")
+        else:
+            st.dataframe(res, use_container_width=True)
+
+with tab_stats:
+    st.caption("Fallas por paso del flujo (aula, agregar, modal, formulario, guardar…) "
+               "sobre las filas que llegaron a ese paso")
+    st.dataframe(fallas_por_paso(), use_container_width=True)
+    st.caption("Throughput por ejecución")
+    st.dataframe(throughput_por_run(), use_container_width=True)
+
+with tab_import:
+    st.caption("Carga en el historial los CSV existentes de 'logs/'. Los ya importados se omiten.")
+    if st.button("Importar CSV de logs/"):
+        importados, omitidos = importar_logs()
+        st.success(f"Importados: {importados} • Omitidos (ya existentes o ilegibles): {omitidos}")
@@ -0,0 +1,84 @@
+# bench_lote.py
+# Benchmark de memoria/CPU del recorrido de filas de run_batch, sin navegador.
+#
+# Compara, para un lote sintético (50k filas por defecto):
+#   - ANTES:   t.iterrows() + r.to_dict() + un dict de resultado por fila con str(fila.get(...))
+#   - AHORA:   armar_lote() (FilaLote) + ResultadosLote (columnar) recorrido en streaming
+# Mide pico de memoria con tracemalloc y tiempo de pared. Uso:
+#   python bench_lote.py [n_filas]
+
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+
+import pandas as pd
+
+from lote_av import LOG_CAMPOS, ResultadosLote, armar_lote
+
+def _lote_sintetico(n: int) -> pd.DataFrame:
+    base = pd.Timestamp("2025-08-15 07:40")
+    t = pd.DataFrame({
+        "CORREO":   [f"docente{i % 900}@autonomadeica.edu.pe" for i in range(n)],
+        "TEMA":     [f"Curso {i % 400} - Grupo {i % 12}" for i in range(n)],
+        "PERIODO":  "20252",
+        "FACULTAD": "Ingeniería",
+        "ESCUELA":  "Ingeniería de Sistemas",
+        "CURSO":    [f"Curso {i % 400}" for i in range(n)],
+        "GRUPO":    [f"G{i % 12}" for i in range(n)],
+        "INICIO":   [base + pd.Timedelta(minutes=10 * (i % 60)) for i in range(n)],
+        "FIN":      [base + pd.Timedelta(minutes=10 * (i % 60) + 100) for i in range(n)],
+        "DURACION": "",
+        "DIAS":     ["LU,MI" if i % 2 else "MA,JU" for i in range(n)],
+    })
+    # mismas columnas que agrega _prep_dataframe (runner_av.py)
+    t["_INICIO_DT"] = pd.to_datetime(t["INICIO"])
+    t["_FIN_DT"] = pd.to_datetime(t["FIN"])
+    t["DURACION_CALC"] = pd.Series([100] * n, dtype=object)
+    return t
+
+def _antes(t: pd.DataFrame) -> int:
+    resultados = []
+    for i, r in t.iterrows():
+        fila = r.to_dict()
+        resultados.append({
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "status": "GUARDADO",
+            "correo": str(fila.get("CORREO","")),
+            "tema": str(fila.get("TEMA","")),
+            "periodo": str(fila.get("PERIODO","")),
+            "facultad": str(fila.get("FACULTAD","")),
+            "escuela": str(fila.get("ESCUELA","")),
+            "curso": str(fila.get("CURSO","")),
+            "grupo": str(fila.get("GRUPO","")),
+            "inicio": str(fila.get("_INICIO_DT","")),
+            "fin": str(fila.get("_FIN_DT","")),
+            "duracion": str(fila.get("DURACION_CALC","")),
+            "dias": str(fila.get("DIAS","")),
+            "mensaje": "Guardado. Aula seleccionada.",
+            "meeting_url": "",
+        })
+    return sum(len(r) for r in resultados)
+
+def _ahora(t: pd.DataFrame) -> int:
+    res = ResultadosLote()
+    for fila in armar_lote(t):
+        res.agregar(fila, "GUARDADO", "Guardado. Aula seleccionada.")
+    # lo que hace _write_logs: recorrer en streaming
+    return sum(len(r) for r in res)
+
+def _medir(nombre: str, fn, t: pd.DataFrame) -> None:
+    tracemalloc.start()
+    t0 = time.perf_counter()
+    fn(t)
+    dt = time.perf_counter() - t0
+    _, pico = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{nombre:6s} | {dt:7.2f} s | pico {pico / 1e6:8.1f} MB")
+
+if __name__ == "__main__":
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 50_000
+    t = _lote_sintetico(n)
+    print(f"{n} filas • {len(LOG_CAMPOS)} campos de log")
+    _medir("ANTES", _antes, t)
+    _medir("AHORA", _ahora, t)
@@ -0,0 +1,113 @@
+# control_av.py
+# Controlador adaptativo de tiempos para run_batch (runner_av.py).
+#
+# Mide la latencia de los viajes reales al servidor (búsqueda del Aula, apertura del modal,
+# confirmación y cierre tras Guardar) y la tasa de errores de las últimas filas. Solo cuentan
+# las mediciones exitosas: un paso que agota su espera duraría lo mismo que el timeout y
+# empujaría el timeout hacia arriba sin fin; en su lugar se marca como timeout de la fila. Con eso ajusta, dentro de los límites de abajo:
+#   - el timeout por acción y el de navegación (page.set_default_timeout / _navigation_)
+#   - la pausa entre filas (si el servidor se satura, se espacian los envíos)
+# Cada ajuste queda registrado en `decisiones` para que el operador vea por qué cambió el ritmo.
+
+import time
+from types import SimpleNamespace
+from collections import deque
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Dict, List, Optional
+
+# ---------- Límites (ajustables) ----------
+TIMEOUT_MIN_MS     = 3000    # nunca esperar menos que esto por acción
+TIMEOUT_MAX_MS     = 20000   # ni más que esto
+NAV_TIMEOUT_MIN_MS = 8000
+NAV_TIMEOUT_MAX_MS = 45000
+PAUSA_MIN_MS       = 0       # pausa entre filas
+PAUSA_MAX_MS       = 3000
+FACTOR_TIMEOUT     = 4.0     # timeout = FACTOR x latencia del paso más lento
+FACTOR_NAV         = 2.5     # nav timeout = FACTOR x timeout por acción
+ALFA_EWMA          = 0.3     # peso de la última medición en el promedio móvil
+VENTANA_FILAS      = 10      # filas consideradas para la tasa de errores
+UMBRAL_ERRORES     = 0.3     # desde esta tasa se frena el ritmo
+PASO_BAJADA_PAUSA  = 50      # ms que se recortan a la pausa por fila sana
+# -----------------------------------------
+
+class ControlAdaptativo:
+    def __init__(self, timeout_ms: int, nav_timeout_ms: int, pausa_ms: int = 0):
+        self.timeout_ms = timeout_ms
+        self.nav_timeout_ms = nav_timeout_ms
+        self.pausa_ms = pausa_ms
+        self.latencias: Dict[str, float] = {}          # EWMA por paso (ms)
+        self.errores = deque(maxlen=VENTANA_FILAS)     # True = la fila falló
+        self.decisiones: List[str] = []
+        self._timeout_en_fila = False
+
+    @contextmanager
+    def medir(self, paso: str):
+        """
+        Mide la duración de un paso. Si el bloque pone `m.valida = False` (no hubo respuesta)
+        o lanza una excepción, no entra en el promedio; si fue por timeout, se anota.
+        """
+        m = SimpleNamespace(valida=True)
+        t0 = time.perf_counter()
+        try:
+            yield m
+        except Exception as e:
+            if "timeout" in type(e).__name__.lower() or "timeout" in str(e).lower():
+                self._timeout_en_fila = True
+            raise
+        if not m.valida:
+            return
+        ms = (time.perf_counter() - t0) * 1000
+        prev = self.latencias.get(paso)
+        self.latencias[paso] = ms if prev is None else ALFA_EWMA * ms + (1 - ALFA_EWMA) * prev
+
+    def tasa_errores(self) -> float:
+        return (sum(self.errores) / len(self.errores)) if self.errores else 0.0
+
+    def fin_fila(self, n_fila: int, error: bool) -> bool:
+        """
+        Registra el resultado de la fila y recalcula tiempos.
+        Devuelve True si cambió algún valor (para reaplicarlo a la página).
+        """
+        self.errores.append(bool(error))
+        antes = (self.timeout_ms, self.nav_timeout_ms, self.pausa_ms)
+
+        paso_lento: Optional[str] = None
+        if self.latencias:
+            paso_lento = max(self.latencias, key=self.latencias.get)
+            objetivo = FACTOR_TIMEOUT * self.latencias[paso_lento]
+            # no bajar de golpe: como mucho un 25% por fila
+            objetivo = max(objetivo, self.timeout_ms * 0.75)
+            self.timeout_ms = int(min(max(objetivo, TIMEOUT_MIN_MS), TIMEOUT_MAX_MS))
+        if self._timeout_en_fila:
+            self.timeout_ms = int(min(self.timeout_ms * 1.5, TIMEOUT_MAX_MS))
+        self.nav_timeout_ms = int(min(max(FACTOR_NAV * self.timeout_ms, NAV_TIMEOUT_MIN_MS), NAV_TIMEOUT_MAX_MS))
+
+        tasa = self.tasa_errores()
+        if tasa >= UMBRAL_ERRORES:
+            self.pausa_ms = int(min(max(self.pausa_ms * 2, 200), PAUSA_MAX_MS))
+        elif not error:
+            self.pausa_ms = int(max(self.pausa_ms - PASO_BAJADA_PAUSA, PAUSA_MIN_MS))
+
+        self._timeout_en_fila = False
+        despues = (self.timeout_ms, self.nav_timeout_ms, self.pausa_ms)
+        if not self._cambio_relevante(antes, despues):
+            self.timeout_ms, self.nav_timeout_ms, self.pausa_ms = antes
+            return False
+
+        lento = f"'{paso_lento}' {self.latencias[paso_lento]:.0f} ms" if paso_lento else "sin medir"
+        self.decisiones.append(
+            f"[{datetime.now().isoformat(timespec='seconds')}] fila {n_fila}: "
+            f"timeout {antes[0]}->{despues[0]} ms | nav {antes[1]}->{despues[1]} ms | "
+            f"pausa {antes[2]}->{despues[2]} ms | paso más lento {lento} | "
+            f"errores {sum(self.errores)}/{len(self.errores)}"
+        )
+        return True
+
+    @staticmethod
+    def _cambio_relevante(antes, despues) -> bool:
+        # los timeouts se reaplican solo si varían >10%; la pausa, ante cualquier cambio
+        for a, d in zip(antes[:2], despues[:2]):
+            if a and abs(d - a) / a > 0.10:
+                return True
+        return antes[2] != despues[2]
@@ -0,0 +1,158 @@
+# estado_av.py
+# Estado de la última carga aceptada por PERIODO y cálculo de "delta" (sincronización incremental).
+#
+# Cada PERIODO guarda en ESTADO_DIR/estado_<PERIODO>.json las filas GUARDADO, indexadas por
+# la sesión (CORREO, CURSO, GRUPO, hora de INICIO, DIAS). Al subir un nuevo Excel se compara contra ese estado y cada fila
+# queda como NUEVO, CAMBIADO o SIN_CAMBIOS; lo que estaba en el estado y ya no viene se
+# reporta como ELIMINADO. Solo NUEVO y CAMBIADO deben ir al navegador.
+# Como la hora y los DIAS son parte de la clave, mover una sesión da NUEVO + ELIMINADO, no CAMBIADO.
+
+import os
+import json
+from datetime import datetime
+from typing import Dict, Any, List, Tuple, Union
+
+import pandas as pd
+
+from sesiones_av import mascara_dias
+
+ESTADO_DIR = "estado"
+os.makedirs(ESTADO_DIR, exist_ok=True)
+
+DELTA_NUEVO       = "NUEVO"
+DELTA_CAMBIADO    = "CAMBIADO"
+DELTA_SIN_CAMBIOS = "SIN_CAMBIOS"
+DELTA_ELIMINADO   = "ELIMINADO"
+
+# Columnas que, si cambian, obligan a reenviar la fila
+COLUMNAS_HUELLA = ["TEMA", "FACULTAD", "ESCUELA", "INICIO", "FIN", "DURACION", "DIAS"]
+
+def _ruta_estado(periodo: Any) -> str:
+    p = "".join(ch for ch in str(periodo).strip() if ch.isalnum() or ch in "-_") or "SIN_PERIODO"
+    return os.path.join(ESTADO_DIR, f"estado_{p}.json")
+
+def _txt(s: pd.Series) -> pd.Series:
+    return s.fillna("").astype(str).str.strip().str.replace(r"\s+", " ", regex=True).str.upper()
+
+def _fecha_txt(s: pd.Series) -> pd.Series:
+    v = pd.to_datetime(s, errors="coerce")
+    return v.dt.strftime("%Y-%m-%d %H:%M").fillna("")
+
+def _num_txt(s: pd.Series) -> pd.Series:
+    v = pd.to_numeric(s, errors="coerce")
+    return v.map(lambda x: "" if pd.isna(x) else str(int(round(x))))
+
+def _periodos(df: pd.DataFrame) -> pd.Series:
+    return df["PERIODO"].fillna("").astype(str).str.strip().str.replace(r"\.0$", "", regex=True)
+
+def clave_sesion(df: pd.DataFrame) -> pd.Series:
+    """Solo la clave de sesión (ver claves_y_huellas)."""
+    hora = pd.to_datetime(df["INICIO"], errors="coerce").dt.strftime("%H:%M").fillna("")
+    mask, _ = mascara_dias(df["DIAS"])
+    dias = pd.Series([",".join(str(d) for d in fila.nonzero()[0]) for fila in mask], index=df.index)
+    base = (df["CORREO"].fillna("").astype(str).str.strip().str.lower()
+            + "|" + _txt(df["CURSO"]) + "|" + _txt(df["GRUPO"]) + "|" + hora + "|" + dias)
+    n = base.groupby([_periodos(df), base]).cumcount()
+    return base.where(n == 0, base + "#" + n.astype(str))
+
+def claves_y_huellas(df: pd.DataFrame) -> Tuple[pd.Series, pd.Series]:
+    """
+    Clave de sesión (CORREO|CURSO|GRUPO|HH:MM|días) y huella de contenido, vectorizadas.
+    La hora de INICIO (sin fecha: las fechas globales cambian cada periodo) y los DIAS
+    normalizados distinguen varias sesiones del mismo grupo sin depender del orden del Excel.
+    Solo sesiones idénticas en todo eso llevan además un sufijo #n.
+    """
+    claves = clave_sesion(df)
+
+    partes = []
+    for c in COLUMNAS_HUELLA:
+        if c in ("INICIO", "FIN"):
+            partes.append(_fecha_txt(df[c]))
+        elif c == "DURACION":
+            partes.append(_num_txt(df[c]))
+        elif c == "DIAS":
+            partes.append(_txt(df[c]).str.replace("|", ",", regex=False).str.replace(" ", "", regex=False))
+        else:
+            partes.append(_txt(df[c]))
+    huellas = partes[0]
+    for p in partes[1:]:
+        huellas = huellas + "\x1f" + p
+    return claves, huellas
+
+def asignar_claves(df: pd.DataFrame) -> pd.DataFrame:
+    """Agrega _CLAVE a df (columnas ya en mayúsculas) si no la trae."""
+    if "_CLAVE" not in df.columns:
+        df["_CLAVE"] = clave_sesion(df)
+    return df
+
+def cargar_estado(periodo: Any) -> Dict[str, Dict[str, Any]]:
+    ruta = _ruta_estado(periodo)
+    if not os.path.exists(ruta):
+        return {}
+    try:
+        with open(ruta, "r", encoding="utf-8") as f:
+            return json.load(f).get("filas", {})
+    except Exception:
+        return {}
+
+def calcular_delta(df: pd.DataFrame) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    Devuelve (df_con_delta, eliminados):
+      - df_con_delta: copia de df con columnas _CLAVE y _DELTA (NUEVO/CAMBIADO/SIN_CAMBIOS)
+      - eliminados:   filas del último estado aceptado que ya no vienen en el Excel
+    """
+    t = df.copy()
+    t.columns = [c.upper().strip() for c in t.columns]
+    claves, huellas = claves_y_huellas(t)
+    periodos = _periodos(t)
+    t["_CLAVE"] = claves
+    t["_DELTA"] = DELTA_NUEVO
+
+    eliminados: List[Dict[str, Any]] = []
+    for periodo, idx in periodos.groupby(periodos).groups.items():
+        previo = cargar_estado(periodo)
+        if not previo:
+            continue
+        anterior = pd.Series({k: v.get("huella", "") for k, v in previo.items()})
+        prev_h = claves.loc[idx].map(anterior)
+        existe = prev_h.notna()
+        igual  = existe & (prev_h == huellas.loc[idx])
+        t.loc[idx[existe.to_numpy()], "_DELTA"] = DELTA_CAMBIADO
+        t.loc[idx[igual.to_numpy()],  "_DELTA"] = DELTA_SIN_CAMBIOS
+
+        vigentes = set(claves.loc[idx])
+        for k, v in previo.items():
+            if k not in vigentes:
+                eliminados.append({"PERIODO": periodo, "_CLAVE": k, **v.get("datos", {}),
+                                   "_DELTA": DELTA_ELIMINADO})
+    return t, pd.DataFrame(eliminados)
+
+def registrar_carga(filas: Union[pd.DataFrame, List[Dict[str, Any]]]) -> None:
+    """
+    Actualiza el estado con las filas aceptadas (GUARDADO). Las claves que no
+    se reenviaron se conservan: el estado siempre refleja lo último cargado.
+    Las filas deben traer _CLAVE calculada sobre el Excel completo (calcular_delta /
+    asignar_claves): recalcularla sobre un subconjunto podría renumerar sesiones.
+    """
+    if len(filas) == 0:
+        return
+    t = pd.DataFrame(filas)
+    t.columns = [c.upper().strip() for c in t.columns]
+    if "_CLAVE" not in t.columns:
+        raise ValueError("registrar_carga requiere la columna _CLAVE del lote completo.")
+    claves = t["_CLAVE"]
+    huellas = claves_y_huellas(t)[1]
+    periodos = _periodos(t)
+    ahora = datetime.now().isoformat(timespec="seconds")
+
+    for periodo, idx in periodos.groupby(periodos).groups.items():
+        estado = cargar_estado(periodo)
+        for i in idx:
+            estado[claves.loc[i]] = {
+                "huella": huellas.loc[i],
+                "cargado": ahora,
+                "datos": {c: str(t.at[i, c]) for c in ["CORREO", "TEMA", "CURSO", "GRUPO", "INICIO", "FIN", "DIAS"]},
+            }
+        with open(_ruta_estado(periodo), "w", encoding="utf-8") as f:
+            json.dump({"periodo": periodo, "actualizado": ahora, "filas": estado},
+                      f, ensure_ascii=False, indent=1)
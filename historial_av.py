@@ -0,0 +1,209 @@
+# historial_av.py
+# Historial indexado (SQLite) de ejecuciones y filas de runner_av.py.
+#
+# _write_logs sigue dejando el TXT/CSV en logs/, pero además registra aquí la corrida
+# (tabla `runs`) y cada fila (tabla `filas`), con índices por correo, periodo,
+# curso/grupo y status. Los CSV antiguos de logs/ se pueden importar con importar_logs().
+
+import os
+import csv
+import glob
+import sqlite3
+from datetime import datetime
+from typing import Dict, Any, List, Optional, Tuple
+
+import pandas as pd
+
+HIST_DB = os.path.join("logs", "historial_av.sqlite3")
+
+CAMPOS_FILA = ["timestamp","status","correo","tema","periodo","facultad","escuela","curso",
+               "grupo","inicio","fin","duracion","dias","mensaje","meeting_url","verificado","paso","cluster"]
+
+# Orden de los pasos de run_batch (para saber cuántas filas llegaron a cada uno).
+# 'cerrar' solo existe en PRUEBA VISUAL y 'guardar' solo en PRODUCCIÓN.
+_ORDEN_PASOS = {"aula": 0, "agregar": 1, "modal": 2, "formulario": 3, "captura": 4, "cerrar": 5, "guardar": 5}
+_MODO_PASO   = {"cerrar": "PRUEBA VISUAL", "guardar": "PRODUCCIÓN"}
+
+_ESQUEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id          INTEGER PRIMARY KEY AUTOINCREMENT,
+    base_name   TEXT,
+    modo        TEXT,
+    log_csv     TEXT UNIQUE,
+    inicio      TEXT,
+    fin         TEXT,
+    duracion_s  REAL,
+    total       INTEGER,
+    ok          INTEGER,
+    fail        INTEGER,
+    origen      TEXT            -- 'run' (escrito por run_batch) o 'import' (CSV antiguo)
+);
+CREATE TABLE IF NOT EXISTS filas (
+    id          INTEGER PRIMARY KEY AUTOINCREMENT,
+    run_id      INTEGER NOT NULL REFERENCES runs(id) ON DELETE CASCADE,
+    timestamp TEXT, status TEXT, correo TEXT, tema TEXT, periodo TEXT, facultad TEXT,
+    escuela TEXT, curso TEXT, grupo TEXT, inicio TEXT, fin TEXT, duracion TEXT, dias TEXT,
+    mensaje TEXT, meeting_url TEXT, verificado TEXT, paso TEXT, cluster TEXT
+);
+CREATE INDEX IF NOT EXISTS ix_filas_run         ON filas(run_id);
+CREATE INDEX IF NOT EXISTS ix_filas_correo      ON filas(correo);
+CREATE INDEX IF NOT EXISTS ix_filas_periodo     ON filas(periodo);
+CREATE INDEX IF NOT EXISTS ix_filas_curso_grupo ON filas(curso, grupo);
+CREATE INDEX IF NOT EXISTS ix_filas_status      ON filas(status, timestamp);
+"""
+
+def _conectar(db_path: str = HIST_DB) -> sqlite3.Connection:
+    os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+    con = sqlite3.connect(db_path)
+    con.execute("PRAGMA foreign_keys = ON")
+    con.executescript(_ESQUEMA)
+    # bases creadas antes de la columna cluster
+    if "cluster" not in {c[1] for c in con.execute("PRAGMA table_info(filas)")}:
+        con.execute("ALTER TABLE filas ADD COLUMN cluster TEXT")
+    return con
+
+def _modo_desde_nombre(base_name: str) -> str:
+    return "PRUEBA VISUAL" if base_name.upper().endswith("_VISUAL") else "PRODUCCIÓN"
+
+def _paso_desde_mensaje(status: str, mensaje: str) -> str:
+    """Para CSV antiguos sin columna 'paso': se deduce del texto del error."""
+    if status != "ERROR":
+        return ""
+    m = (mensaje or "").lower()
+    if "agregar" in m:
+        return "agregar"
+    if "aula" in m:
+        return "aula"
+    if "modal" in m or "dialog" in m:
+        return "modal"
+    return "desconocido"
+
+def _valores_fila(r: Dict[str, Any]) -> List[str]:
+    v = {k: str(r.get(k, "") or "") for k in CAMPOS_FILA}
+    v["paso"] = v["paso"] or _paso_desde_mensaje(v["status"], v["mensaje"])
+    return [v[k] for k in CAMPOS_FILA]
+
+def registrar_run(base_name: str, rows: List[Dict[str, Any]], log_csv: str,
+                  duracion_s: Optional[float] = None, origen: str = "run",
+                  db_path: str = HIST_DB) -> Optional[int]:
+    """Inserta la corrida y sus filas. Devuelve el id del run (None si ya existía ese CSV)."""
+    marcas = sorted(r.get("timestamp", "") for r in rows if r.get("timestamp"))
+    inicio = marcas[0] if marcas else datetime.now().isoformat(timespec="seconds")
+    fin    = marcas[-1] if marcas else inicio
+    if duracion_s is None and marcas:
+        try:
+            duracion_s = (datetime.fromisoformat(fin) - datetime.fromisoformat(inicio)).total_seconds()
+        except ValueError:
+            duracion_s = None
+    ok   = sum(1 for r in rows if r.get("status") in ("SIMULADO_VISUAL", "GUARDADO"))
+    fail = sum(1 for r in rows if r.get("status") == "ERROR")
+
+    con = _conectar(db_path)
+    try:
+        with con:
+            cur = con.execute(
+                "INSERT OR IGNORE INTO runs (base_name, modo, log_csv, inicio, fin, duracion_s, "
+                "total, ok, fail, origen) VALUES (?,?,?,?,?,?,?,?,?,?)",
+                (base_name, _modo_desde_nombre(base_name), os.path.abspath(log_csv), inicio, fin,
+                 duracion_s, len(rows), ok, fail, origen)
+            )
+            if cur.rowcount == 0:
+                return None
+            run_id = cur.lastrowid
+            con.executemany(
+                f"INSERT INTO filas (run_id, {', '.join(CAMPOS_FILA)}) "
+                f"VALUES (?, {', '.join('?' * len(CAMPOS_FILA))})",
+                [(run_id, *_valores_fila(r)) for r in rows]
+            )
+        return run_id
+    finally:
+        con.close()
+
+def importar_csv(csv_path: str, db_path: str = HIST_DB) -> bool:
+    """Importa un CSV de logs/ (formato _write_logs). False si ya estaba importado."""
+    nombre = os.path.splitext(os.path.basename(csv_path))[0]
+    base_name = nombre.rsplit("_", 2)[0] if nombre.count("_") >= 2 else nombre
+    with open(csv_path, "r", encoding="utf-8", newline="") as f:
+        rows = list(csv.DictReader(f))
+    return registrar_run(base_name, rows, csv_path, origen="import", db_path=db_path) is not None
+
+def importar_logs(log_dir: str = "logs", db_path: str = HIST_DB) -> Tuple[int, int]:
+    """Importa todos los CSV de log_dir. Devuelve (importados, omitidos)."""
+    importados = omitidos = 0
+    for path in sorted(glob.glob(os.path.join(log_dir, "*.csv"))):
+        try:
+            if importar_csv(path, db_path):
+                importados += 1
+            else:
+                omitidos += 1
+        except Exception:
+            omitidos += 1
+    return importados, omitidos
+
+# ---------------- Consultas ----------------
+def _consulta(sql: str, params: tuple = (), db_path: str = HIST_DB) -> pd.DataFrame:
+    con = _conectar(db_path)
+    try:
+        return pd.read_sql_query(sql, con, params=params)
+    finally:
+        con.close()
+
+def ultimo_guardado(correo: str = "", periodo: str = "", curso: str = "", grupo: str = "",
+                    db_path: str = HIST_DB) -> pd.DataFrame:
+    """
+    Última vez que se GUARDÓ cada (correo, periodo, curso, grupo) que cumpla los filtros.
+    No cuentan las filas que la conciliación no encontró en el listado (verificado = 'NO').
+    """
+    filtros, params = ["f.status = 'GUARDADO'", "COALESCE(f.verificado, '') <> 'NO'"], []
+    for col, val in [("correo", correo), ("periodo", periodo), ("curso", curso), ("grupo", grupo)]:
+        if str(val).strip():
+            filtros.append(f"f.{col} = ?")
+            params.append(str(val).strip())
+    return _consulta(
+        "SELECT f.correo, f.periodo, f.curso, f.grupo, MAX(f.timestamp) AS ultimo_guardado, "
+        "COUNT(*) AS veces, MAX(f.meeting_url) AS meeting_url "
+        f"FROM filas f WHERE {' AND '.join(filtros)} "
+        "GROUP BY f.correo, f.periodo, f.curso, f.grupo ORDER BY ultimo_guardado DESC",
+        tuple(params), db_path
+    )
+
+def fallas_por_paso(db_path: str = HIST_DB) -> pd.DataFrame:
+    """
+    Errores por paso y su tasa sobre las filas que llegaron a ese paso (las que no
+    fallaron antes, en corridas del modo que lo tiene). Los errores sin paso conocido
+    se comparan con todas las filas de sus corridas.
+    """
+    t = _consulta(
+        "SELECT f.run_id, r.modo, f.status, COALESCE(NULLIF(f.paso, ''), 'desconocido') AS paso, "
+        "COUNT(*) AS n FROM filas f JOIN runs r ON r.id = f.run_id GROUP BY 1, 2, 3, 4",
+        db_path=db_path
+    )
+    columnas = ["paso", "fallas", "llegaron", "pct_fallas"]
+    if t.empty:
+        return pd.DataFrame(columns=columnas)
+    err = t["status"] == "ERROR"
+    # último paso alcanzado por cada grupo de filas: las que no fallaron pasaron por todos
+    alcance = t["paso"].map(_ORDEN_PASOS).fillna(0).where(err, len(_ORDEN_PASOS))
+
+    out = []
+    for paso, fallas in t[err].groupby("paso")["n"].sum().items():
+        if paso in _ORDEN_PASOS:
+            llego = alcance >= _ORDEN_PASOS[paso]
+            if paso in _MODO_PASO:
+                llego &= t["modo"] == _MODO_PASO[paso]
+        else:
+            llego = t["run_id"].isin(t.loc[err & (t["paso"] == paso), "run_id"])
+        llegaron = int(t.loc[llego, "n"].sum())
+        out.append({"paso": paso, "fallas": int(fallas), "llegaron": llegaron,
+                    "pct_fallas": round(100.0 * fallas / llegaron, 2) if llegaron else None})
+    return pd.DataFrame(out, columns=columnas).sort_values("fallas", ascending=False, ignore_index=True)
+
+def throughput_por_run(db_path: str = HIST_DB) -> pd.DataFrame:
+    """Filas por minuto y tasa de falla de cada corrida."""
+    return _consulta(
+        "SELECT id, inicio, modo, origen, total, ok, fail, ROUND(duracion_s, 1) AS duracion_s, "
+        "CASE WHEN duracion_s > 0 THEN ROUND(60.0 * total / duracion_s, 2) END AS filas_por_min, "
+        "CASE WHEN total > 0 THEN ROUND(100.0 * fail / total, 2) END AS pct_fallas, log_csv "
+        "FROM runs ORDER BY inicio DESC",
+        db_path=db_path
+    )
@@ -0,0 +1,110 @@
+# lote_av.py
+# Representación compacta del lote para run_batch (runner_av.py).
+#
+#   - FilaLote: una tupla tipada por fila, armada UNA vez desde el DataFrame preparado
+#     (sin iterrows ni to_dict por fila; los textos para el log se convierten en bloque).
+#   - ResultadosLote: buffer columnar de resultados (una lista por campo). Las columnas fijas
+#     reutilizan los mismos str de FilaLote; iterarlo produce un dict por fila al vuelo, así
+#     _write_logs / registrar_run lo recorren en streaming sin materializar la lista completa.
+
+from datetime import datetime
+from typing import Any, Dict, Iterator, List, NamedTuple
+
+import pandas as pd
+
+LOG_CAMPOS = ["timestamp","status","correo","tema","periodo","facultad","escuela","curso",
+              "grupo","inicio","fin","duracion","dias","mensaje","meeting_url","verificado","paso","cluster"]
+
+# campos de resultado que dependen de la ejecución (el resto sale de FilaLote)
+_CAMPOS_RUN = ("timestamp", "status", "mensaje", "meeting_url", "verificado", "paso", "cluster")
+
+class FilaLote(NamedTuple):
+    pos: int            # posición 0-based dentro del lote preparado
+    idx: Any            # etiqueta de índice original (fila del Excel subido, aun tras filtrar)
+    correo: str
+    tema: str
+    periodo: str
+    facultad: str
+    escuela: str
+    curso: str
+    grupo: str
+    dias: str
+    inicio: str         # texto del log (str del Timestamp, 'NaT' si no se pudo leer)
+    fin: str
+    duracion: str       # texto de DURACION_CALC (o DURACION si no se pudo calcular)
+    inicio_dt: Any      # Timestamp / NaT, para llenar el formulario
+    fin_dt: Any
+
+def _texto(s: pd.Series) -> List[str]:
+    return s.map(lambda v: "" if v is None or (not isinstance(v, str) and pd.isna(v)) else str(v)).tolist()
+
+def armar_lote(t: pd.DataFrame) -> List[FilaLote]:
+    """Convierte el DataFrame de _prep_dataframe en una lista de FilaLote (columna a columna)."""
+    dur_calc = t["DURACION_CALC"].map(lambda v: "" if v is None or pd.isna(v) else str(int(v)))
+    dur_raw  = _texto(t["DURACION"])
+    duracion = [c or r for c, r in zip(dur_calc.tolist(), dur_raw)]
+    return [
+        FilaLote(*campos)
+        for campos in zip(
+            range(len(t)), t.index.tolist(),
+            _texto(t["CORREO"]), _texto(t["TEMA"]), _texto(t["PERIODO"]), _texto(t["FACULTAD"]),
+            _texto(t["ESCUELA"]), _texto(t["CURSO"]), _texto(t["GRUPO"]), _texto(t["DIAS"]),
+            # str() por valor: con pandas 3, astype(str) deja NaT como nan (float) en vez de 'NaT'
+            [str(v) for v in t["_INICIO_DT"]], [str(v) for v in t["_FIN_DT"]], duracion,
+            t["_INICIO_DT"].tolist(), t["_FIN_DT"].tolist(),
+        )
+    ]
+
+class ResultadosLote:
+    """Resultados en columnas. `for r in res` entrega dicts con LOG_CAMPOS, uno a la vez."""
+    __slots__ = ("_filas", "_cols")
+
+    def __init__(self):
+        self._filas: List[FilaLote] = []
+        self._cols: Dict[str, List[str]] = {k: [] for k in _CAMPOS_RUN}
+
+    def agregar(self, fila: FilaLote, status: str, mensaje: str, meeting_url: str = "",
+                paso: str = "", cluster: str = "") -> int:
+        """Registra el resultado de una fila; devuelve su índice en el buffer."""
+        self._filas.append(fila)
+        c = self._cols
+        c["timestamp"].append(datetime.now().isoformat(timespec="seconds"))
+        c["status"].append(status)
+        c["mensaje"].append(mensaje)
+        c["meeting_url"].append(meeting_url)
+        c["verificado"].append("")
+        c["paso"].append(paso)
+        c["cluster"].append(cluster)
+        return len(self._filas) - 1
+
+    def __len__(self) -> int:
+        return len(self._filas)
+
+    def fila(self, i: int) -> FilaLote:
+        return self._filas[i]
+
+    def valor(self, i: int, campo: str) -> str:
+        if campo in self._cols:
+            return self._cols[campo][i]
+        return getattr(self._filas[i], campo)
+
+    def fijar(self, i: int, campo: str, valor: str) -> None:
+        self._cols[campo][i] = valor
+
+    def contar(self, campo: str, *valores: str) -> int:
+        return sum(1 for v in self._cols[campo] if v in valores)
+
+    def indices(self, campo: str, valor: str) -> List[int]:
+        return [i for i, v in enumerate(self._cols[campo]) if v == valor]
+
+    def __iter__(self) -> Iterator[Dict[str, str]]:
+        c = self._cols
+        for i, f in enumerate(self._filas):
+            yield {
+                "timestamp": c["timestamp"][i], "status": c["status"][i],
+                "correo": f.correo, "tema": f.tema, "periodo": f.periodo, "facultad": f.facultad,
+                "escuela": f.escuela, "curso": f.curso, "grupo": f.grupo,
+                "inicio": f.inicio, "fin": f.fin, "duracion": f.duracion, "dias": f.dias,
+                "mensaje": c["mensaje"][i], "meeting_url": c["meeting_url"][i],
+                "verificado": c["verificado"][i], "paso": c["paso"][i], "cluster": c["cluster"][i],
+            }
@@ -12,9 +12,12 @@
 #   TZ=America/Lima
 
 import os
+import re
 import csv
+import time
 from datetime import datetime
-from typing import Dict, Any, List, Tuple
+from urllib.parse import urlparse
+from typing import Dict, Any, Iterable, List, Optional, Tuple
 
 import pandas as pd
 from dotenv import load_dotenv
@@ -29,6 +32,14 @@ if sys.platform.startswith("win"):
 
 from playwright.sync_api import sync_playwright
 
+from estado_av import asignar_claves, registrar_carga
+from control_av import ControlAdaptativo
+from historial_av import registrar_run
+from sesiones_av import DIA_MAP, partir_dias
+from lote_av import LOG_CAMPOS, FilaLote, ResultadosLote, armar_lote
+from triage_av import (AulaNoEncontrada, AgregarNoDisponible, ModalTimeout, SelectSinValor,
+                       GuardadoNoConfirmado, CLUSTER_GUARDADO, clasificar_error)
+
 load_dotenv()
 
 AV_URL    = os.getenv("AV_URL",    "https://aulavirtual2.autonomadeica.edu.pe/login?ReturnUrl=%2F")
@@ -39,6 +50,9 @@ TZ        = os.getenv("TZ",        "America/Lima")
 
 LOG_DIR = "logs"
 SS_DIR  = "screenshots"
+# Cookies de la sesión del admin para re-ejecutar en caliente. Fuera de logs/ (que se comparte),
+# excluido en .gitignore y borrado al vencer SESION_MAX_MIN o si el lote terminó sin fallas.
+SESION_FILE = ".sesion_av.json"
 os.makedirs(LOG_DIR, exist_ok=True)
 os.makedirs(SS_DIR,  exist_ok=True)
 
@@ -47,9 +61,19 @@ os.makedirs(SS_DIR,  exist_ok=True)
 SLOW_MO_VISUAL         = 180   # ms entre acciones en PRUEBA VISUAL (antes solían usar 200-400)
 DEFAULT_TIMEOUT        = 6000  # 6s por acción
 NAV_TIMEOUT            = 15000 # 15s para navegaciones/recargas
+PROBE_TIMEOUT_MS       = 800   # sondeos de campos que pueden no existir (fallos esperados)
+# Qué se adapta (control_av): el default de la página, la espera de opciones del combo Aula
+# y de los selects dependientes (Periodo/Facultad/Escuela/Curso/Grupo, que llegan del
+# servidor), la apertura del modal y la confirmación de Guardar. Los sondeos de fill/check
+# sobre etiquetas que pueden no existir usan PROBE_TIMEOUT_MS y los clics locales sus
+# valores fijos (800/1200/1500). Login y conciliación usan DEFAULT/NAV_TIMEOUT.
 SELECT2_SEARCH_DELAY   = 12    # ms entre teclas en buscador select2
 AFTER_SELECT_PAUSE_MS  = 180   # pausa breve tras seleccionar opción
 AFTER_OPEN_MODAL_MS    = 250   # pausa breve tras abrir modal
+LISTADO_MAX_PAGINAS    = 200   # tope de páginas al recorrer el listado en la conciliación
+# Dominios de reunión preferidos al leer el enlace de cada fila del listado
+HOSTS_REUNION          = ["zoom.us", "meet.google.com", "teams.microsoft.com", "teams.live.com", "webex.com"]
+SESION_MAX_MIN         = 30    # antigüedad máxima de SESION_FILE para reutilizarla
 
 # -----------------------------------------
 
@@ -77,19 +101,17 @@ def _prep_dataframe(df: pd.DataFrame) -> pd.DataFrame:
     t["_INICIO_DT"] = pd.to_datetime(t["INICIO"], errors="coerce")
     t["_FIN_DT"]    = pd.to_datetime(t["FIN"],    errors="coerce")
 
-    def _dur(row):
-        v = row.get("DURACION")
-        try:
-            if pd.isna(v) or str(v).strip() == "":
-                return _duracion_min(row["_INICIO_DT"], row["_FIN_DT"])
-            return int(v)
-        except Exception:
-            return _duracion_min(row["_INICIO_DT"], row["_FIN_DT"])
-
-    t["DURACION_CALC"] = t.apply(_dur, axis=1)
+    # DURACION si es numérica; si no, minutos entre INICIO y FIN (cruce de medianoche incluido).
+    # Vectorizado: mismo criterio que _duracion_min sin recorrer fila por fila.
+    dur = pd.to_numeric(t["DURACION"], errors="coerce")
+    delta = (t["_FIN_DT"] - t["_INICIO_DT"]).dt.total_seconds() / 60
+    delta = delta.where(delta >= 0, delta + 24 * 60).round()
+    # enteros de Python (truncados como int()) y pd.NA si no se pudo calcular
+    t["DURACION_CALC"] = (dur.fillna(delta) // 1).astype("Int64").astype(object)
     return t
 
-def _write_logs(base_name: str, rows: List[Dict[str, Any]]) -> Tuple[str, str]:
+def _write_logs(base_name: str, rows: Iterable[Dict[str, Any]], duracion_s: float = None) -> Tuple[str, str]:
+    """rows puede ser una lista de dicts o un ResultadosLote (se recorre en streaming)."""
     ts = _now_tag()
     txt_path = os.path.join(LOG_DIR, f"{base_name}_{ts}.txt")
     csv_path = os.path.join(LOG_DIR, f"{base_name}_{ts}.csv")
@@ -101,14 +123,19 @@ def _write_logs(base_name: str, rows: List[Dict[str, Any]]) -> Tuple[str, str]:
                 f"{r['inicio']} -> {r['fin']} | {r['mensaje']}\n"
             )
 
-    fieldnames = ["timestamp","status","correo","tema","periodo","facultad","escuela","curso",
-                  "grupo","inicio","fin","duracion","dias","mensaje","meeting_url"]
+    fieldnames = LOG_CAMPOS
     with open(csv_path, "w", encoding="utf-8", newline="") as c:
         w = csv.DictWriter(c, fieldnames=fieldnames)
         w.writeheader()
         for r in rows:
             w.writerow({k: r.get(k,"") for k in fieldnames})
 
+    # Historial indexado (SQLite); si falla, los TXT/CSV ya quedaron escritos
+    try:
+        registrar_run(base_name, rows, csv_path, duracion_s=duracion_s)
+    except Exception:
+        pass
+
     return txt_path, csv_path
 
 # ---------------- Login ----------------
@@ -182,10 +209,47 @@ def _login(page):
     except:
         pass
 
+def _borrar_sesion():
+    try:
+        os.remove(SESION_FILE)
+    except OSError:
+        pass
+
+def _sesion_reutilizable() -> bool:
+    """True si SESION_FILE existe y es reciente; si está vencida, la borra."""
+    try:
+        edad_min = (time.time() - os.path.getmtime(SESION_FILE)) / 60
+    except OSError:
+        return False
+    if edad_min > SESION_MAX_MIN:
+        _borrar_sesion()
+        return False
+    return True
+
+def _guardar_sesion(context):
+    try:
+        context.storage_state(path=SESION_FILE)
+        os.chmod(SESION_FILE, 0o600)
+    except:
+        pass
+
+def _entrar_con_sesion(page):
+    """Va directo a Videoconferencias con las cookies guardadas; si caducaron, hace login."""
+    try:
+        page.goto(AV_VC_URL, wait_until="domcontentloaded")
+        page.wait_for_load_state("networkidle", timeout=NAV_TIMEOUT)
+    except:
+        pass
+    if "login" in page.url.lower():
+        _login(page)
+
 # ---------- Helpers página lista (Aula + Agregar) ----------
-def _select_aula(page, correo: str) -> bool:
+def _select_aula(page, correo: str, timeout: int = 1500, medicion=None) -> bool:
     """
     Selecciona el combo 'Aula' (select2 o select nativo) usando el CORREO.
+    timeout: espera de la opción buscada (viaje al servidor del select2).
+    medicion: la de ctrl.medir("aula"); si se agotó la espera del select2 y resolvió
+    el select nativo, lo medido es el timeout y no una latencia: se invalida.
     """
     correo = (correo or "").strip()
     if not correo:
@@ -204,14 +268,16 @@ def _select_aula(page, correo: str) -> bool:
         search.type(correo, delay=SELECT2_SEARCH_DELAY)
 
         option = page.locator(".select2-results__option", has_text=correo).first
-        option.click(timeout=1500)
+        option.click(timeout=timeout)
 
         page.wait_for_timeout(AFTER_SELECT_PAUSE_MS)
         return True
     except Exception:
         # Fallback: select nativo asociado a label Aula
+        if medicion is not None:
+            medicion.valida = False
         try:
-            page.get_by_label("Aula", exact=False).select_option(label=correo)
+            page.get_by_label("Aula", exact=False).select_option(label=correo, timeout=PROBE_TIMEOUT_MS)
             page.wait_for_timeout(AFTER_SELECT_PAUSE_MS)
             return True
         except Exception:
@@ -234,27 +300,31 @@ def _click_agregar(page) -> bool:
     except:
         return False
 
-def _wait_modal(page):
-    for sel in [".modal.show", ".modal-dialog", "form", "[role='dialog']"]:
-        try:
-            page.locator(sel).first.wait_for(state="visible", timeout=DEFAULT_TIMEOUT)
-            page.wait_for_timeout(AFTER_OPEN_MODAL_MS)
-            return
-        except:
-            continue
-    page.wait_for_timeout(220)
+def _wait_modal(page, timeout: int = DEFAULT_TIMEOUT) -> bool:
+    # un solo locator combinado: esperar selector por selector sumaba hasta 4x timeout
+    # y esa demora entraba como latencia del paso "modal" (.modal.in = Bootstrap 3)
+    try:
+        page.locator(".modal.show, .modal.in, .modal-dialog, [role='dialog']").first.wait_for(
+            state="visible", timeout=timeout
+        )
+        page.wait_for_timeout(AFTER_OPEN_MODAL_MS)
+        return True
+    except:
+        page.wait_for_timeout(220)
+        return False
 
 # ---------- Helpers del formulario (modal) ----------
 def _safe_fill(page, label_text: str, value: Any):
     if value is None or str(value).strip() == "":
         return
     value = str(value)
+    to = PROBE_TIMEOUT_MS
     probes = [
-        lambda: page.get_by_label(label_text, exact=False).fill(value),
-        lambda: page.locator(f"input[placeholder*='{label_text}' i]").first.fill(value),
-        lambda: page.locator(f"input[name*='{label_text.lower()}']").first.fill(value),
-        lambda: page.locator(f"textarea[placeholder*='{label_text}' i]").first.fill(value),
-        lambda: page.locator(f"textarea[name*='{label_text.lower()}']").first.fill(value),
+        lambda: page.get_by_label(label_text, exact=False).fill(value, timeout=to),
+        lambda: page.locator(f"input[placeholder*='{label_text}' i]").first.fill(value, timeout=to),
+        lambda: page.locator(f"input[name*='{label_text.lower()}']").first.fill(value, timeout=to),
+        lambda: page.locator(f"textarea[placeholder*='{label_text}' i]").first.fill(value, timeout=to),
+        lambda: page.locator(f"textarea[name*='{label_text.lower()}']").first.fill(value, timeout=to),
     ]
     for f in probes:
         try:
@@ -263,87 +333,140 @@ def _safe_fill(page, label_text: str, value: Any):
         except:
             continue
 
-def _select2_like(page, root_sel: str, value: str) -> bool:
+def _select2_like(page, root_sel: str, value: str) -> Optional[bool]:
+    """
+    True si el select2 quedó con `value`, False si el control existe pero no tiene ese
+    valor ("No results found" o la selección mostrada no coincide), None si no hay control.
+    """
     try:
         root = page.locator(root_sel).first
         root.click(timeout=800)
+    except:
+        return None
+    try:
         page.keyboard.type(value, delay=SELECT2_SEARCH_DELAY)
         page.wait_for_timeout(120)
+        sin_resultados = page.locator(".select2-container--open .select2-results__message").first
+        if sin_resultados.count() and sin_resultados.is_visible():
+            page.keyboard.press("Escape")
+            return False
         page.keyboard.press("Enter")
-        return True
+        # leer lo que quedó seleccionado y compararlo con el valor pedido
+        mostrado = root.evaluate(
+            """el => {
+                const r = el.querySelector('.select2-selection__rendered')
+                       || (el.closest('.select2') || el.parentElement || el)
+                              .querySelector('.select2-selection__rendered');
+                return r ? (r.getAttribute('title') || r.innerText || '').trim() : null;
+            }"""
+        )
+        if mostrado is None:
+            return True     # sin texto renderizado que leer: se confía en el Enter
+        return _norm_tema(mostrado) == _norm_tema(value)      # mismo criterio que _opcion_exacta
     except:
         return False
 
-def _safe_select(page, label_text: str, value: Any):
-    if value is None or str(value).strip() == "":
-        return
-    value = str(value)
-    # select clásico por label
+def _opciones_select(page, label_text: str) -> Optional[List[str]]:
+    """Textos de las opciones del <select> de esa etiqueta (None si no hay <select>)."""
     try:
-        page.get_by_label(label_text, exact=False).select_option(label=value)
-        return
+        loc = page.get_by_label(label_text, exact=False).first
+        if loc.count() == 0:
+            return None
+        return loc.evaluate(
+            "el => el.tagName === 'SELECT' ? Array.from(el.options).map(o => (o.text || '').trim()) : null"
+        )
     except:
-        pass
-    # combobox/select2 por aria/placeholder
+        return None
+
+def _opcion_exacta(opciones: List[str], value: Any) -> Optional[str]:
+    """Texto de la opción igual a `value` tras normalizar espacios y mayúsculas (o None)."""
+    buscado = _norm_tema(value)
+    return next((o for o in opciones if _norm_tema(o) == buscado), None)
+
+def _safe_select(page, label_text: str, value: Any, timeout: int = DEFAULT_TIMEOUT) -> Optional[bool]:
+    """
+    True si quedó seleccionado, False si el control existe pero no tiene el valor,
+    None si el formulario no tiene ese campo (se omite, como antes).
+    timeout: espera de las opciones (viaje al servidor, la adapta control_av).
+    """
+    if value is None or str(value).strip() == "":
+        return True
+    value = str(value)
+
+    # select clásico por label (también el <select> oculto que usa select2):
+    # las opciones dependientes (Escuela tras Facultad...) llegan del servidor, se esperan hasta `timeout`
+    opciones = _opciones_select(page, label_text)
+    if opciones is not None:
+        limite = time.perf_counter() + timeout / 1000
+        opcion = _opcion_exacta(opciones, value)
+        while opcion is None and time.perf_counter() < limite:
+            page.wait_for_timeout(150)
+            opcion = _opcion_exacta(_opciones_select(page, label_text) or [], value)
+        if opcion is not None:
+            try:
+                page.get_by_label(label_text, exact=False).select_option(label=opcion, timeout=timeout)
+                return True
+            except:
+                pass
+        # sin la opción (select2 con búsqueda remota) o <select> oculto: seguir por la vía select2
+
+    # combobox/select2 por aria/placeholder y cercano a label
     for sel in [
         f"[role='combobox'][aria-label*='{label_text}' i]",
         f"input[aria-label*='{label_text}' i]",
         f"input[placeholder*='{label_text}' i]",
-    ]:
-        if _select2_like(page, sel, value): return
-    # select2 cercano a label
-    for sel in [
         f".select2:has(label:has-text('{label_text}'))",
         f"div:has(> label:has-text('{label_text}')) .select2-selection",
         f"div:has(> label:has-text('{label_text}')) [role='combobox']",
     ]:
-        if _select2_like(page, sel, value): return
+        r = _select2_like(page, sel, value)
+        if r is not None:
+            return r
+    # el <select> existe pero ni él ni el select2 tienen el valor
+    return False if opciones is not None else None
 
 def _marcar_dias(page, dias_str: str):
     if not dias_str:
         return
-    partes = [d.strip() for d in str(dias_str).replace("|", ",").split(",") if d.strip()]
-    DIA_MAP = {
-        "1":"LUNES","2":"MARTES","3":"MIÉRCOLES","4":"JUEVES","5":"VIERNES","6":"SÁBADO","7":"DOMINGO",
-        "LU":"LUNES","MA":"MARTES","MI":"MIÉRCOLES","JU":"JUEVES","VI":"VIERNES","SA":"SÁBADO","DO":"DOMINGO",
-        "LUNES":"LUNES","MARTES":"MARTES","MIERCOLES":"MIÉRCOLES","MIÉRCOLES":"MIÉRCOLES",
-        "JUEVES":"JUEVES","VIERNES":"VIERNES","SABADO":"SÁBADO","SÁBADO":"SÁBADO","DOMINGO":"DOMINGO",
-    }
+    partes = partir_dias(dias_str)
     for d in partes:
         dd = DIA_MAP.get(d.upper(), d)
         ok = False
         try:
-            page.get_by_label(dd, exact=False).check()
+            page.get_by_label(dd, exact=False).check(timeout=PROBE_TIMEOUT_MS)
             ok = True
         except:
             try:
-                page.get_by_text(dd, exact=False).first.click()
+                page.get_by_text(dd, exact=False).first.click(timeout=PROBE_TIMEOUT_MS)
                 ok = True
             except:
                 pass
         if not ok:
             try:
-                page.locator(f"input[type='checkbox'][value*='{dd}' i]").first.check()
+                page.locator(f"input[type='checkbox'][value*='{dd}' i]").first.check(timeout=PROBE_TIMEOUT_MS)
             except:
                 pass
 
-def _llenar_formulario(page, row: Dict[str, Any]):
+def _llenar_formulario(page, row: FilaLote, timeout: int = DEFAULT_TIMEOUT):
     # Selects (jerárquicos)
-    _safe_select(page, "Periodo",  row.get("PERIODO",""))
-    _safe_select(page, "Facultad", row.get("FACULTAD",""))
-    _safe_select(page, "Escuela",  row.get("ESCUELA",""))
-    _safe_select(page, "Curso",    row.get("CURSO",""))
-    _safe_select(page, "Grupo",    row.get("GRUPO",""))
+    sin_valor = [
+        f"{label}='{valor}'"
+        for label, valor in [("Periodo", row.periodo), ("Facultad", row.facultad),
+                             ("Escuela", row.escuela), ("Curso", row.curso), ("Grupo", row.grupo)]
+        if _safe_select(page, label, valor, timeout) is False     # None = el formulario no tiene ese campo
+    ]
+    if sin_valor:
+        raise SelectSinValor("No se pudo seleccionar: " + ", ".join(sin_valor))
 
     # Inputs básicos
-    for (label, col) in [
-        ("Correo", "CORREO"),
-        ("Usuario", "CORREO"),
-        ("Host", "CORREO"),
-        ("Tema", "TEMA"),
-        ("Título", "TEMA"),
+    for (label, valor) in [
+        ("Correo", row.correo),
+        ("Usuario", row.correo),
+        ("Host", row.correo),
+        ("Tema", row.tema),
+        ("Título", row.tema),
     ]:
-        _safe_fill(page, label, row.get(col,""))
+        _safe_fill(page, label, valor)
 
     # Fechas / horas
     def fmt(dt):
@@ -351,16 +474,15 @@ def _llenar_formulario(page, row: Dict[str, Any]):
             return pd.to_datetime(dt).strftime("%Y-%m-%d %H:%M")
         except:
             return ""
-    _safe_fill(page, "Inicio", fmt(row.get("_INICIO_DT")))
-    _safe_fill(page, "Fin",    fmt(row.get("_FIN_DT")))
+    _safe_fill(page, "Inicio", fmt(row.inicio_dt))
+    _safe_fill(page, "Fin",    fmt(row.fin_dt))
 
     # Duración
-    dur = row.get("DURACION_CALC","") or row.get("DURACION","")
     for label in ["Duración","Duracion","Minutos"]:
-        _safe_fill(page, label, str(dur))
+        _safe_fill(page, label, row.duracion)
 
     # Días
-    _marcar_dias(page, row.get("DIAS",""))
+    _marcar_dias(page, row.dias)
 
 # ---------- Limpieza / errores ----------
 def _cerrar_modal_forzado(page) -> bool:
@@ -384,28 +506,208 @@ def _cerrar_modal_forzado(page) -> bool:
     except:
         return False
 
-def _sin_modal(page) -> bool:
+def _sin_modal(page, timeout: int = 700) -> bool:
     """True si no hay modal visible."""
     try:
         page.locator(".modal.show, .modal-dialog, [role='dialog']").first.wait_for(
-            state="hidden", timeout=700
+            state="hidden", timeout=timeout
         )
         return True
     except:
         return False
 
+# ---------- Conciliación post-guardado (listado de videoconferencias) ----------
+def _norm_tema(tema: Any) -> str:
+    return re.sub(r"\s+", " ", str(tema or "")).strip().upper()
+
+def _norm_inicio(valor: Any) -> str:
+    """Normaliza una fecha/hora a 'YYYY-MM-DD HH:MM' (cadena vacía si no se puede)."""
+    if valor is None or str(valor).strip() == "":
+        return ""
+    txt = str(valor).strip()
+    try:
+        # el listado suele venir en dd/mm/yyyy; lo ISO se deja tal cual
+        dayfirst = not re.match(r"^\d{4}-", txt)
+        v = pd.to_datetime(txt, errors="coerce", dayfirst=dayfirst)
+        if pd.isna(v):
+            return ""
+        return v.strftime("%Y-%m-%d %H:%M")
+    except Exception:
+        return ""
+
+def _leer_pagina_listado(page) -> List[Dict[str, Any]]:
+    """
+    Lee la tabla visible del listado: tema, inicio y enlace de reunión de cada fila.
+    Solo cuentan enlaces absolutos escritos en el href (no '#', 'javascript:' ni
+    enlaces al propio AV); se prefieren los de HOSTS_REUNION.
+    """
+    return page.evaluate(
+        """({ propio, hosts }) => {
+            const tabla = Array.from(document.querySelectorAll('table'))
+                .find(t => t.offsetParent !== null && t.querySelector('tbody tr'));
+            if (!tabla) return [];
+            const heads = Array.from(tabla.querySelectorAll('thead th'))
+                .map(th => (th.innerText || '').trim().toLowerCase());
+            const idx = (...keys) => heads.findIndex(h => keys.some(k => h.includes(k)));
+            const iTema   = idx('tema', 'título', 'titulo');
+            const iInicio = idx('inicio', 'fecha');
+            const urlRx = /https?:\\/\\/[^\\s"'<>]+/g;
+            const host = u => { try { return new URL(u).hostname.toLowerCase(); } catch (e) { return ''; } };
+            const externo = u => { const h = host(u); return h && h !== propio && h !== location.hostname; };
+            const conocido = u => hosts.some(k => host(u) === k || host(u).endsWith('.' + k));
+            return Array.from(tabla.querySelectorAll('tbody tr')).map(tr => {
+                const celdas = Array.from(tr.querySelectorAll('td')).map(td => (td.innerText || '').trim());
+                // getAttribute: a.href resolvería '#' a la URL del propio listado
+                const links = Array.from(tr.querySelectorAll('a[href]'))
+                    .map(a => (a.getAttribute('href') || '').trim())
+                    .concat((tr.innerText || '').match(urlRx) || [])
+                    .filter(h => /^https?:\\/\\//i.test(h) && externo(h));
+                return {
+                    tema:   iTema   >= 0 ? (celdas[iTema]   || '') : '',
+                    inicio: iInicio >= 0 ? (celdas[iInicio] || '') : '',
+                    texto:  celdas.join(' | '),
+                    url:    links.find(conocido) || links[0] || ''
+                };
+            });
+        }""",
+        {"propio": (urlparse(AV_VC_URL).hostname or "").lower(), "hosts": HOSTS_REUNION}
+    ) or []
+
+def _pagina_siguiente(page) -> bool:
+    """Avanza a la siguiente página del listado; False si ya no hay más."""
+    for sel in [
+        "li.paginate_button.next:not(.disabled) a",
+        ".pagination li:not(.disabled) a[aria-label*='Next' i]",
+        ".pagination li:not(.disabled) a:has-text('»')",
+        "a:has-text('Siguiente')",
+        "button:has-text('Siguiente'):not([disabled])",
+    ]:
+        try:
+            loc = page.locator(sel).first
+            if loc.count() == 0 or not loc.is_visible():
+                continue
+            loc.click(timeout=1200)
+            return True
+        except:
+            continue
+    return False
+
+def _leer_listado_vc(page) -> List[Dict[str, Any]]:
+    """
+    Recorre TODO el listado del aula seleccionada (paginado) en una sola pasada.
+    Intenta primero mostrar el máximo de registros por página para reducir clics.
+    """
+    try:
+        page.locator("select[name$='_length'], .dataTables_length select").first.select_option(
+            value="-1", timeout=800
+        )
+    except:
+        try:
+            page.locator("select[name$='_length'], .dataTables_length select").first.select_option(
+                value="100", timeout=800
+            )
+        except:
+            pass
+    page.wait_for_timeout(AFTER_SELECT_PAUSE_MS)
+
+    entradas: List[Dict[str, Any]] = []
+    firma_prev = None
+    for _ in range(LISTADO_MAX_PAGINAS):
+        filas = _leer_pagina_listado(page)
+        firma = "\n".join(f["texto"] for f in filas)
+        if firma == firma_prev:
+            break   # el paginador no avanzó
+        entradas.extend(filas)
+        firma_prev = firma
+        if not _pagina_siguiente(page):
+            break
+        # esperar a que cambie el contenido (sin dormir de más)
+        for _ in range(10):
+            page.wait_for_timeout(150)
+            nuevas = _leer_pagina_listado(page)
+            if "\n".join(f["texto"] for f in nuevas) != firma:
+                break
+    return entradas
+
+def _indexar_listado(entradas: List[Dict[str, Any]]) -> Tuple[Dict[Tuple[str, str], List[Dict]], bool]:
+    """
+    Índice (tema, inicio) -> entradas del listado, y si el listado trae un inicio legible.
+    Si ninguna entrada tiene inicio legible, se indexa solo por tema (inicio = "").
+    """
+    con_inicio = any(_norm_inicio(e.get("inicio")) for e in entradas)
+    indice: Dict[Tuple[str, str], List[Dict]] = {}
+    for e in entradas:
+        tema = _norm_tema(e.get("tema"))
+        if not tema:
+            continue
+        inicio = _norm_inicio(e.get("inicio")) if con_inicio else ""
+        indice.setdefault((tema, inicio), []).append(e)
+    return indice, con_inicio
+
+def _conciliar(page, resultados: ResultadosLote) -> int:
+    """
+    Tras el lote, verifica en bloque que cada fila GUARDADO exista en el listado
+    de su aula. Completa 'meeting_url' y 'verificado' (SI/NO). Si el listado del aula
+    no se pudo leer (o vino vacío) las filas quedan sin verificar (""), no como NO:
+    marcarlas NO las sacaría del estado y se volverían a crear en la próxima carga.
+    Devuelve cuántas filas quedaron verificadas.
+    """
+    por_aula: Dict[str, List[int]] = {}
+    for i in resultados.indices("status", "GUARDADO"):
+        por_aula.setdefault(resultados.fila(i).correo, []).append(i)
+
+    verificados = 0
+    for correo, filas in por_aula.items():
+        try:
+            page.goto(AV_VC_URL, wait_until="domcontentloaded")
+            page.wait_for_load_state("networkidle", timeout=NAV_TIMEOUT)
+        except:
+            pass
+        try:
+            entradas = _leer_listado_vc(page) if _select_aula(page, correo) else []
+        except Exception:
+            entradas = []
+        indice, con_inicio = _indexar_listado(entradas)
+        if not indice:
+            # sin tabla, sin columna de tema o sin filas: no hay con qué comparar
+            for i in filas:
+                resultados.fijar(i, "mensaje", resultados.valor(i, "mensaje") + " Listado no legible: sin verificar.")
+            continue
+
+        for i in filas:
+            f = resultados.fila(i)
+            clave = (_norm_tema(f.tema), _norm_inicio(f.inicio) if con_inicio else "")
+            # cada entrada del listado verifica a una sola fila
+            candidatas = indice.get(clave) or []
+            e = candidatas.pop(0) if candidatas else None
+            if e is None:
+                resultados.fijar(i, "verificado", "NO")
+                resultados.fijar(i, "cluster", CLUSTER_GUARDADO)
+                resultados.fijar(i, "mensaje", resultados.valor(i, "mensaje") + " No encontrada en el listado.")
+                continue
+            resultados.fijar(i, "verificado", "SI")
+            resultados.fijar(i, "meeting_url", e.get("url", "") or resultados.valor(i, "meeting_url"))
+            verificados += 1
+    return verificados
+
 # ---------------- Runner principal ----------------
-def run_batch(df: pd.DataFrame, modo: str, headless: bool) -> Dict[str, Any]:
+def run_batch(df: pd.DataFrame, modo: str, headless: bool, reusar_sesion: bool = False) -> Dict[str, Any]:
     """
     modo:
       - "PRUEBA VISUAL (navegador, sin guardar)"
       - "PRODUCCIÓN"
+    reusar_sesion: usa las cookies de SESION_FILE (si son recientes) y evita el login;
+                   pensado para re-ejecutar un cluster de fallas recién clasificado.
     """
     if not AV_URL or not AV_USER or not AV_PASS:
         raise RuntimeError("Faltan variables de entorno AV_URL/AV_USER/AV_PASS en .env")
 
+    t0 = time.perf_counter()
     t = _prep_dataframe(df)
-    resultados: List[Dict[str, Any]] = []
+    # claves de sesión sobre el lote completo (app.py ya las trae de calcular_delta)
+    asignar_claves(t)
+    lote = armar_lote(t)
+    resultados = ResultadosLote()
     visual = modo.startswith("PRUEBA VISUAL")
     base_log_name = "cargamasiva_av"
 
@@ -415,10 +717,13 @@ def run_batch(df: pd.DataFrame, modo: str, headless: bool) -> Dict[str, Any]:
             slow_mo=(SLOW_MO_VISUAL if visual else 0),
             args=["--start-maximized"]
         )
+        vigente = _sesion_reutilizable()     # además borra una sesión vencida
+        en_caliente = reusar_sesion and vigente
         context = browser.new_context(
             no_viewport=True,
             locale="es-PE",
-            timezone_id=TZ
+            timezone_id=TZ,
+            storage_state=(SESION_FILE if en_caliente else None)
         )
         # timeouts por defecto coherentes
         context.set_default_timeout(DEFAULT_TIMEOUT)
@@ -428,33 +733,57 @@ def run_batch(df: pd.DataFrame, modo: str, headless: bool) -> Dict[str, Any]:
         page.set_default_timeout(DEFAULT_TIMEOUT)
         page.set_default_navigation_timeout(NAV_TIMEOUT)
 
-        try:
-            _login(page)
+        # tiempos y ritmo se recalculan fila a fila según la latencia observada
+        ctrl = ControlAdaptativo(DEFAULT_TIMEOUT, NAV_TIMEOUT)
 
-            for i, r in t.iterrows():
-                fila = r.to_dict()
-                correo = str(fila.get("CORREO",""))
-                tema   = str(fila.get("TEMA",""))
+        try:
+            if en_caliente:
+                _entrar_con_sesion(page)
+            else:
+                _login(page)
+            _guardar_sesion(context)
+
+            for fila in lote:
+                # número de fila para el usuario: el del Excel subido, no la posición en el lote filtrado
+                n_fila = fila.idx + 1 if isinstance(fila.idx, int) else fila.idx
+                correo = fila.correo
+                fila_error = False
+                paso = "aula"
+                aula_ok = True
 
                 try:
                     # 0) Seleccionar AULA (combo superior con el correo)
-                    aula_ok = _select_aula(page, correo)
+                    with ctrl.medir("aula") as m:
+                        aula_ok = _select_aula(page, correo, ctrl.timeout_ms, m)
+                        m.valida = m.valida and aula_ok
+                    if not aula_ok and not visual:
+                        # guardar sin aula crearía la reunión en el aula anterior
+                        raise AulaNoEncontrada(f"No se pudo seleccionar el Aula '{correo}'.")
                     msg_aula = "Aula seleccionada." if aula_ok else "No se pudo seleccionar Aula."
+                    fila_error = not aula_ok
 
                     # 1) Clic en Agregar
+                    paso = "agregar"
                     if not _click_agregar(page):
-                        raise RuntimeError("No se pudo hacer clic en 'Agregar'.")
+                        raise AgregarNoDisponible("No se pudo hacer clic en 'Agregar'.")
 
                     # 2) Esperar modal
-                    _wait_modal(page)
+                    paso = "modal"
+                    with ctrl.medir("modal"):
+                        if not _wait_modal(page, ctrl.timeout_ms):
+                            raise ModalTimeout(f"El formulario no abrió en {ctrl.timeout_ms} ms.")
 
                     # 3) Llenar formulario
-                    _llenar_formulario(page, fila)
+                    paso = "formulario"
+                    # (no se mide: sus sondeos fallan a propósito; los selects sí esperan
+                    # al servidor con el timeout adaptado)
+                    _llenar_formulario(page, fila, ctrl.timeout_ms)
 
                     # 4) Captura
+                    paso = "captura"
                     ss_path = os.path.join(
                         SS_DIR,
-                        f"{'visual' if visual else 'prod'}_row{i+1}_{_now_tag()}.png"
+                        f"{'visual' if visual else 'prod'}_row{n_fila}_{_now_tag()}.png"
                     )
                     try:
                         page.screenshot(path=ss_path, full_page=True)
@@ -463,6 +792,7 @@ def run_batch(df: pd.DataFrame, modo: str, headless: bool) -> Dict[str, Any]:
 
                     if visual:
                         # 5) Cerrar modal SIN guardar
+                        paso = "cerrar"
                         cerrado = False
                         for txt in ["Cerrar","Cancelar","Cancelar cambios","Salir"]:
                             try:
@@ -488,6 +818,7 @@ def run_batch(df: pd.DataFrame, modo: str, headless: bool) -> Dict[str, Any]:
                         meeting = ""
                     else:
                         # Guardar
+                        paso = "guardar"
                         guardado = False
                         for txt in ["Guardar","Crear","Crear videoconferencia","Guardar cambios","Save"]:
                             try:
@@ -501,64 +832,59 @@ def run_batch(df: pd.DataFrame, modo: str, headless: bool) -> Dict[str, Any]:
                                     break
                                 except:
                                     continue
-                        if guardado:
-                            # cerrar sweetalert si aparece
+                        if not guardado:
+                            raise GuardadoNoConfirmado("No se encontró el botón Guardar/Crear.")
+                        # respuesta del servidor: sweetalert de confirmación (si este AV lo muestra)
+                        with ctrl.medir("guardar") as m:
                             try:
                                 page.locator(".swal-button--confirm, .swal2-confirm").first.click(timeout=2000)
                             except:
-                                pass
-                        # limpiar modal si quedó
-                        if not _sin_modal(page):
-                            _cerrar_modal_forzado(page)
+                                m.valida = False
+                        # si el modal sigue abierto, el AV no aceptó el guardado
+                        with ctrl.medir("cierre") as m:
+                            m.valida = _sin_modal(page, min(ctrl.timeout_ms, 5000))
+                        if not m.valida:
+                            raise GuardadoNoConfirmado("El formulario siguió abierto tras Guardar.")
 
                         status  = "GUARDADO"
                         mensaje = f"Guardado. {msg_aula}"
                         meeting = ""
 
-                    resultados.append({
-                        "timestamp": datetime.now().isoformat(timespec="seconds"),
-                        "status": status,
-                        "correo": correo,
-                        "tema": tema,
-                        "periodo": str(fila.get("PERIODO","")),
-                        "facultad": str(fila.get("FACULTAD","")),
-                        "escuela": str(fila.get("ESCUELA","")),
-                        "curso": str(fila.get("CURSO","")),
-                        "grupo": str(fila.get("GRUPO","")),
-                        "inicio": str(fila.get("_INICIO_DT","")),
-                        "fin": str(fila.get("_FIN_DT","")),
-                        "duracion": str(fila.get("DURACION_CALC","")),
-                        "dias": str(fila.get("DIAS","")),
-                        "mensaje": mensaje,
-                        "meeting_url": meeting
-                    })
+                    resultados.agregar(fila, status, mensaje, meeting)
 
                 except Exception as e:
+                    fila_error = True
                     # Captura y limpieza antes de pasar a la siguiente fila
-                    err_ss = os.path.join(SS_DIR, f"error_row{i+1}_{_now_tag()}.png")
+                    err_ss = os.path.join(SS_DIR, f"error_row{n_fila}_{_now_tag()}.png")
                     try:
                         page.screenshot(path=err_ss, full_page=True)
                     except:
                         pass
                     _cerrar_modal_forzado(page)
 
-                    resultados.append({
-                        "timestamp": datetime.now().isoformat(timespec="seconds"),
-                        "status": "ERROR",
-                        "correo": correo,
-                        "tema": tema,
-                        "periodo": str(fila.get("PERIODO","")),
-                        "facultad": str(fila.get("FACULTAD","")),
-                        "escuela": str(fila.get("ESCUELA","")),
-                        "curso": str(fila.get("CURSO","")),
-                        "grupo": str(fila.get("GRUPO","")),
-                        "inicio": str(fila.get("_INICIO_DT","")),
-                        "fin": str(fila.get("_FIN_DT","")),
-                        "duracion": str(fila.get("DURACION_CALC","")),
-                        "dias": str(fila.get("DIAS","")),
-                        "mensaje": f"Excepción: {e}",
-                        "meeting_url": ""
-                    })
+                    resultados.agregar(fila, "ERROR", f"Excepción: {e}", paso=paso,
+                                       cluster=clasificar_error(e, paso, aula_ok))
+
+                # Ajuste adaptativo de timeouts y pausa entre filas
+                if ctrl.fin_fila(n_fila, fila_error):
+                    page.set_default_timeout(ctrl.timeout_ms)
+                    page.set_default_navigation_timeout(ctrl.nav_timeout_ms)
+                if ctrl.pausa_ms:
+                    page.wait_for_timeout(ctrl.pausa_ms)
+
+            # 6) Conciliación en bloque: una pasada por el listado de cada aula
+            if not visual:
+                try:
+                    _conciliar(page, resultados)
+                except Exception:
+                    pass
+                # 7) Estado de la última carga aceptada (para la sincronización delta)
+                try:
+                    aceptadas = [resultados.fila(k).pos for k in resultados.indices("status", "GUARDADO")
+                                 if resultados.valor(k, "verificado") != "NO"]
+                    registrar_carga(t.iloc[aceptadas])
+                except Exception:
+                    pass
         finally:
             try:
                 context.close()
@@ -567,12 +893,30 @@ def run_batch(df: pd.DataFrame, modo: str, headless: bool) -> Dict[str, Any]:
                 pass
 
     suf = "_VISUAL" if visual else ""
-    txt, csv = _write_logs("cargamasiva_av"+suf, resultados)
+    txt, csv = _write_logs("cargamasiva_av"+suf, resultados, time.perf_counter() - t0)
+    log_control = ""
+    if ctrl.decisiones:
+        log_control = os.path.join(LOG_DIR, f"cargamasiva_av{suf}_control_{_now_tag()}.txt")
+        with open(log_control, "w", encoding="utf-8") as f:
+            f.write("\n".join(ctrl.decisiones) + "\n")
+    # filas a re-ejecutar por cluster (mismas columnas que el lote original)
+    con_cluster = [k for k in range(len(resultados)) if resultados.valor(k, "cluster")]
+    if not con_cluster:
+        _borrar_sesion()    # nada que re-ejecutar: no dejar cookies en disco
+    fallas = t.iloc[[resultados.fila(k).pos for k in con_cluster]].copy()
+    fallas["_CLUSTER"] = [resultados.valor(k, "cluster") for k in con_cluster]
+    fallas["_MENSAJE"] = [resultados.valor(k, "mensaje") for k in con_cluster]
     return {
         "total": len(resultados),
-        "ok": len([r for r in resultados if r["status"] in ("SIMULADO_VISUAL","GUARDADO")]),
-        "fail": len([r for r in resultados if r["status"] == "ERROR"]),
+        "ok": resultados.contar("status", "SIMULADO_VISUAL", "GUARDADO"),
+        "fail": resultados.contar("status", "ERROR"),
+        "verificados": resultados.contar("verificado", "SI"),
+        "no_encontrados": resultados.contar("verificado", "NO"),
         "log_txt": txt,
         "log_csv": csv,
-        "screenshots_dir": SS_DIR
+        "log_control": log_control,
+        "timeout_final_ms": ctrl.timeout_ms,
+        "pausa_final_ms": ctrl.pausa_ms,
+        "screenshots_dir": SS_DIR,
+        "fallas": fallas
     }
@@ -0,0 +1,104 @@
+# sesiones_av.py
+# Expansión de sesiones recurrentes: DIAS de cada fila + rango de fechas global -> ocurrencias.
+#
+# Usa los mismos códigos de día que el runner (DIA_MAP: 1..7, LU..DO, nombres con o sin tilde).
+# Todo es vectorizado: cada fila se reduce a una máscara de 7 días y el calendario a un
+# vector de días de semana, así un semestre para miles de grupos se calcula en ~1 s.
+
+import re
+from datetime import date
+from typing import Any, Iterable, List, Tuple
+
+import numpy as np
+import pandas as pd
+
+DIA_MAP = {
+    "1":"LUNES","2":"MARTES","3":"MIÉRCOLES","4":"JUEVES","5":"VIERNES","6":"SÁBADO","7":"DOMINGO",
+    "LU":"LUNES","MA":"MARTES","MI":"MIÉRCOLES","JU":"JUEVES","VI":"VIERNES","SA":"SÁBADO","DO":"DOMINGO",
+    "LUNES":"LUNES","MARTES":"MARTES","MIERCOLES":"MIÉRCOLES","MIÉRCOLES":"MIÉRCOLES",
+    "JUEVES":"JUEVES","VIERNES":"VIERNES","SABADO":"SÁBADO","SÁBADO":"SÁBADO","DOMINGO":"DOMINGO",
+}
+# Nombre -> día de semana de Python (lunes = 0)
+DIA_NUM = {"LUNES":0,"MARTES":1,"MIÉRCOLES":2,"JUEVES":3,"VIERNES":4,"SÁBADO":5,"DOMINGO":6}
+
+def partir_dias(dias_str: Any) -> List[str]:
+    """
+    'LU,MI|VI' -> ['LU','MI','VI']. Lo usan la vista previa y _marcar_dias, así ambos
+    marcan los mismos días; un DIAS numérico leído como float ('1.0') queda como '1'.
+    """
+    if dias_str is None or (isinstance(dias_str, float) and pd.isna(dias_str)):
+        return []
+    partes = (re.sub(r"\.0$", "", d.strip()) for d in str(dias_str).replace("|", ",").split(","))
+    return [d for d in partes if d]
+
+def _mascara_una(dias_str: Any) -> Tuple[Tuple[bool, ...], str]:
+    m = [False] * 7
+    invalidos = []
+    for d in partir_dias(dias_str):
+        nombre = DIA_MAP.get(d.upper())
+        if nombre is None:
+            invalidos.append(d)
+        else:
+            m[DIA_NUM[nombre]] = True
+    return tuple(m), ",".join(invalidos)
+
+def mascara_dias(dias: pd.Series) -> Tuple[np.ndarray, pd.Series]:
+    """
+    Matriz (filas x 7) con los días marcados y una serie con los códigos no reconocidos.
+    Se parsea solo cada valor distinto de DIAS (suelen ser unas pocas decenas).
+    """
+    claves = dias.fillna("").astype(str).str.strip().str.upper().to_numpy(dtype=str)
+    codigos, pos = np.unique(claves, return_inverse=True)
+    parsed = [_mascara_una(c) for c in codigos]
+    tabla = np.array([p[0] for p in parsed], dtype=bool).reshape(-1, 7)
+    invalidos = np.array([p[1] for p in parsed], dtype=object)[pos]
+    return tabla[pos], pd.Series(invalidos, index=dias.index)
+
+def _calendario(desde: date, hasta: date, feriados: Iterable[Any] = ()) -> pd.DatetimeIndex:
+    fechas = pd.date_range(pd.Timestamp(desde).normalize(), pd.Timestamp(hasta).normalize(), freq="D")
+    excluir = pd.to_datetime(pd.Series(list(feriados), dtype=object), errors="coerce").dropna().dt.normalize()
+    return fechas[~fechas.isin(excluir)]
+
+def parsear_feriados(texto: str) -> List[date]:
+    """Una fecha por línea (o separadas por coma); se ignora lo que no se pueda leer."""
+    partes = [p.strip() for p in str(texto or "").replace(",", "\n").splitlines() if p.strip()]
+    out = []
+    for p in partes:
+        v = pd.to_datetime(p, errors="coerce", dayfirst=not p[:4].isdigit())
+        if not pd.isna(v):
+            out.append(v.date())
+    return out
+
+def contar_sesiones(df: pd.DataFrame, desde: date, hasta: date, feriados: Iterable[Any] = ()) -> pd.Series:
+    """Número de sesiones por fila en [desde, hasta] sin feriados."""
+    mask, _ = mascara_dias(df["DIAS"])
+    cal = _calendario(desde, hasta, feriados)
+    por_dia = np.bincount(np.asarray(cal.dayofweek), minlength=7)      # cuántos lunes, martes, ...
+    return pd.Series(mask.astype(np.int64) @ por_dia, index=df.index, name="SESIONES")
+
+def expandir_sesiones(df: pd.DataFrame, desde: date, hasta: date, feriados: Iterable[Any] = ()) -> pd.DataFrame:
+    """
+    Una fila por ocurrencia: _FILA (índice original), FECHA, INICIO, FIN y las columnas
+    de identificación del grupo. La hora sale de INICIO/FIN; si FIN < INICIO cruza medianoche.
+    """
+    mask, _ = mascara_dias(df["DIAS"])
+    cal = _calendario(desde, hasta, feriados)
+    filas, dias = np.nonzero(mask[:, np.asarray(cal.dayofweek)])
+
+    ini = pd.to_datetime(df["INICIO"], errors="coerce")
+    fin = pd.to_datetime(df["FIN"],    errors="coerce")
+    h_ini = (ini - ini.dt.normalize()).to_numpy()
+    h_fin = (fin - fin.dt.normalize()).to_numpy()
+    h_fin = np.where(h_fin < h_ini, h_fin + np.timedelta64(1, "D"), h_fin)
+
+    fecha = cal.to_numpy()[dias]
+    out = pd.DataFrame({
+        "_FILA":  df.index.to_numpy()[filas],
+        "FECHA":  fecha,
+        "INICIO": fecha + h_ini[filas],
+        "FIN":    fecha + h_fin[filas],
+    })
+    for c in ["CORREO", "TEMA", "CURSO", "GRUPO"]:
+        if c in df.columns:
+            out[c] = df[c].to_numpy()[filas]
+    return out
@@ -0,0 +1,61 @@
+# triage_av.py
+# Clasificación de fallas de run_batch en grupos ("clusters") para re-ejecutar solo lo necesario.
+#
+# El runner lanza excepciones específicas en cada punto de falla conocido; con el tipo de la
+# excepción y el paso en que ocurrió, clasificar_error() asigna el cluster de cada fila ERROR.
+# Las filas GUARDADO que la conciliación no encontró en el listado cuentan como
+# GUARDADO_NO_CONFIRMADO.
+
+from typing import Dict, Optional
+
+CLUSTER_AULA     = "AULA_NO_ENCONTRADA"
+CLUSTER_AGREGAR  = "AGREGAR_NO_DISPONIBLE"
+CLUSTER_MODAL    = "MODAL_TIMEOUT"
+CLUSTER_SELECT   = "SELECT_SIN_VALOR"
+CLUSTER_GUARDADO = "GUARDADO_NO_CONFIRMADO"
+CLUSTER_OTRO     = "OTRO"
+
+DESCRIPCION_CLUSTER: Dict[str, str] = {
+    CLUSTER_AULA:     "No se encontró el Aula (correo) en el combo superior.",
+    CLUSTER_AGREGAR:  "No apareció el botón 'Agregar'.",
+    CLUSTER_MODAL:    "El modal del formulario no abrió a tiempo.",
+    CLUSTER_SELECT:   "Algún select (Periodo/Facultad/Escuela/Curso/Grupo) no tiene el valor.",
+    CLUSTER_GUARDADO: "Se pulsó Guardar pero no se confirmó (o no aparece en el listado).",
+    CLUSTER_OTRO:     "Error no clasificado (ver captura y mensaje).",
+}
+
+# ---------- Excepciones que lanza runner_av.py ----------
+class FallaRunner(RuntimeError):
+    cluster = CLUSTER_OTRO
+
+class AulaNoEncontrada(FallaRunner):
+    cluster = CLUSTER_AULA
+
+class AgregarNoDisponible(FallaRunner):
+    cluster = CLUSTER_AGREGAR
+
+class ModalTimeout(FallaRunner):
+    cluster = CLUSTER_MODAL
+
+class SelectSinValor(FallaRunner):
+    cluster = CLUSTER_SELECT
+
+class GuardadoNoConfirmado(FallaRunner):
+    cluster = CLUSTER_GUARDADO
+
+# Si la excepción no es propia (p. ej. TimeoutError de Playwright), decide el paso
+_CLUSTER_POR_PASO = {
+    "aula":       CLUSTER_AULA,
+    "agregar":    CLUSTER_AGREGAR,
+    "modal":      CLUSTER_MODAL,
+    "formulario": CLUSTER_SELECT,
+    "guardar":    CLUSTER_GUARDADO,
+}
+
+def clasificar_error(exc: Optional[BaseException], paso: str, aula_ok: bool = True) -> str:
+    if isinstance(exc, FallaRunner):
+        return exc.cluster
+    if not aula_ok:
+        # sin aula seleccionada todo lo que sigue falla en cascada
+        return CLUSTER_AULA
+    return _CLUSTER_POR_PASO.get(paso or "", CLUSTER_OTRO)